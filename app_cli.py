@@ -4,6 +4,7 @@ import random
 from core.shoppinglist import ShoppingList
 from core.appengine import AppEngine
 from core.items import Item, ItemPool
+from core.itemsview import ItemsView
 
 
 class AppCLI:
@@ -11,6 +12,7 @@ class AppCLI:
 
     def __init__(self, shopping_list=None, items=None):
         self.app_engine = AppEngine(shopping_list, items)
+        self.items_view = None
 
     def run(self):
         "Function to Run Command Inputs"
@@ -25,6 +27,14 @@ class AppCLI:
 
             if not self.app_engine.continue_execution:
                 break
+        self.close()
+
+    def close(self):
+        "Function to stop following the item pool"
+        if self.items_view is not None:
+            self.items_view.close()
+            self.items_view = None
+        self.app_engine.close()
 
     def execute_command(self, cmd):
         "Function to Execute Commands Base off Input"
@@ -49,16 +59,23 @@ class AppCLI:
             self.app_engine.process_add_item(cmd)
         elif cmd.startswith('del'):
             self.app_engine.process_del_item(cmd)
+        elif cmd.startswith('reprice'):
+            self.app_engine.process_reprice(cmd)
+        elif cmd.startswith('find'):
+            self.app_engine.process_find_item(cmd)
         else:
             self.app_engine.message = f'"{cmd}" is not a valid command.'
 
     def process_ask(self):
         """Function to ask a question or show the shopping list"""
+        if self.is_list_unbound():
+            self.app_engine.message = self.get_stale_warning()
+            return
         random_index = random.randint(
-            0, len(self.app_engine.shopping_list.list)
+            0, len(self.app_engine.shopping_list)
             )
         self.app_engine.message = self.show_list(mask_index=random_index)
-        if random_index < len(self.app_engine.shopping_list.list):
+        if random_index < len(self.app_engine.shopping_list):
             self.app_engine.correct_answer = (
                 self.app_engine.shopping_list.get_item_price(random_index)
                 )
@@ -73,20 +90,49 @@ class AppCLI:
         if what == 'items':
             self.app_engine.message = self.show_items()
         elif what == 'list':
-            self.app_engine.message = self.show_list()
+            if self.is_list_unbound():
+                self.app_engine.message = self.get_stale_warning()
+            else:
+                self.app_engine.message = (
+                    self.show_list() + self.get_stale_warning())
         else:
             self.app_engine.message = f'Cannot show {what}.\n'
             self.app_engine.message += 'Usage: show list|items'
 
+    def get_stale_warning(self):
+        "Function to get the warning shown for a stale shopping list"
+        if not getattr(self.app_engine.shopping_list, 'stale', False):
+            return ''
+        return ('Some items are no longer in the item pool. '
+                'Use "list" to create a new shopping list.')
+
+    def is_list_unbound(self):
+        "Function to check if the stale shopping list lost its items"
+        shopping_list = self.app_engine.shopping_list
+        return (getattr(shopping_list, 'stale', False)
+                and getattr(shopping_list, 'items', ()) is None)
+
+    def get_items_view(self):
+        "Function to get the sorted item names and widths of the item pool"
+        items = self.app_engine.items
+        if self.items_view is None or self.items_view.item_pool is not items:
+            if self.items_view is not None:
+                self.items_view.close()
+            self.items_view = ItemsView(items)
+        return self.items_view
+
     def show_items(self):
         "Function to show all items"
-        max_name, max_price = 0, 0
-        for item in self.app_engine.items.items.values():
-            max_name = max(max_name, len(item.name))
-            max_price = max(max_price, len(item.get_price_str()))
+        items = self.app_engine.items.items
+        if hasattr(self.app_engine.items, 'subscribe'):
+            view = self.get_items_view()
+            max_name, names = view.get_max_name(), view.names
+        else:
+            max_name = max((len(name) for name in items), default=0)
+            names = sorted(items.keys())
         out = 'ITEMS\n'
-        for item_name in sorted(self.app_engine.items.items.keys()):
-            item = self.app_engine.items.items[item_name]
+        for item_name in names:
+            item = items[item_name]
             padding = max_name - len(item.name)
             out += (
                 item.get_list_item_str() + ' ...' +
@@ -100,13 +146,13 @@ class AppCLI:
         max_name_len = len(total.name) - 4
         max_order = total.get_order()
 
-        for item, _ in self.app_engine.shopping_list.list:
+        for item, _ in self.app_engine.shopping_list:
             max_name_len = max(max_name_len, len(item.name))
             max_order = max(max_order, item.get_order())
 
         out = 'SHOPPING LIST\n'
         for i, (item, quantity) in enumerate(
-            self.app_engine.shopping_list.list
+            self.app_engine.shopping_list
         ):
             hide_price = mask_index == i
             padding = max_name_len - len(item.name)
@@ -118,7 +164,7 @@ class AppCLI:
             )
 
         hide_price = mask_index == len(
-            self.app_engine.shopping_list.list
+            self.app_engine.shopping_list
         )
         q_len = 7
 
@@ -19,6 +19,16 @@ class AppEngine:
         self.message = None
         self.correct_answer = None
         self.status = None
+        if hasattr(items, 'subscribe') and hasattr(
+                shopping_list, 'on_pool_change'):
+            items.subscribe(shopping_list.on_pool_change)
+
+    def close(self):
+        """Method Description: Unsubscribe the shopping list from the
+        item pool."""
+        if hasattr(self.items, 'unsubscribe') and hasattr(
+                self.shopping_list, 'on_pool_change'):
+            self.items.unsubscribe(self.shopping_list.on_pool_change)
 
     def process_answer(self, cmd):
         """Method Description: Process the user's answer."""
@@ -68,3 +78,54 @@ class AppEngine:
             self.items.remove_item(item_name)
         except NonExistingItemError as error:
             print(error)
+            if hasattr(self.items, 'find_items'):
+                names = [item.name
+                         for item in self.items.find_items(item_name, 3)]
+                if names:
+                    print(f'Did you mean: {", ".join(names)}?')
+
+    def process_reprice(self, cmd):
+        """Method Description: Process repricing all or the listed items
+        by a factor."""
+        factor = ''
+        try:
+            factor, _, names_str = cmd[8:].strip().partition(' ')
+            names = {name.strip() for name in names_str.split(',')
+                     if name.strip()}
+            if not factor:
+                self.message = 'Usage: reprice <factor> [<item_name>, ...]'
+                return self.message
+            factor = float(factor)
+            for name in names:
+                if self.items.get_item(name) is None:
+                    raise NonExistingItemError(name)
+            changed = self.items.reprice(
+                factor, (lambda item: item.name in names) if names else None)
+            self.message = f'{len(changed)} items repriced.'
+        except ValueError:
+            self.message = f'could not convert string to float: "{factor}"'
+        except (NonExistingItemError, InvalidItemNameError,
+                InvalidItemPriceError) as error:
+            self.message = str(error)
+        except ArithmeticError:
+            self.message = f'Cannot reprice by "{factor}".'
+
+        return self.message
+
+    def process_find_item(self, cmd):
+        """Method Description: Process finding items by exact name
+        or, with a leading "~", by similar names."""
+        query = cmd[5:].strip()
+        if query.startswith('~'):
+            found = self.items.find_items(query[1:].strip())
+        else:
+            item = self.items.get_item(query)
+            found = [item] if item is not None else []
+        if found:
+            self.message = 'FOUND\n' + '\n'.join(
+                f'{item.get_list_item_str()} ... {item.get_price_str()}'
+                for item in found)
+        else:
+            self.message = f'No items match "{query}".\n'
+            self.message += 'Usage: find <item_name>|~<query>'
+        return self.message
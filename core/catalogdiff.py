@@ -0,0 +1,118 @@
+"""Module Description: This module contains the CatalogDiff class."""
+
+try:
+    from core.errors import InvalidItemNameError, InvalidItemPriceError
+    from core.items import Item, ItemPool
+except ImportError:
+    pass
+
+
+def _get_prices(catalog):
+    """Get a name -> price dict from an ItemPool, a dict of items or a
+    snapshot dict of prices."""
+    if isinstance(catalog, ItemPool):
+        catalog = catalog.items
+    return {
+        name: val.price if isinstance(val, Item) else val
+        for name, val in catalog.items()
+    }
+
+
+class CatalogDiff:
+    """Represents the items added, removed and repriced between two catalogs.
+
+    The text format has one change per line:
+        + <item_name>: <item_price>
+        - <item_name>
+        ~ <item_name>: <item_price>
+    """
+
+    def __init__(self, added=None, removed=None, repriced=None):
+        """Initialize the diff with added items, removed item names and
+        (item_name, new_price) pairs."""
+        self.added = list(added or [])
+        self.removed = list(removed or [])
+        self.repriced = list(repriced or [])
+
+    @classmethod
+    def between(cls, old, new):
+        """Compute the diff that turns the old catalog into the new one.
+
+        Each catalog is walked once with dict lookups into the other, so
+        the diff takes O(n) time. Removed and repriced names keep the old
+        catalog's order; added items keep the new catalog's order."""
+        old_prices, new_prices = _get_prices(old), _get_prices(new)
+        diff = cls()
+        for name, price in old_prices.items():
+            if name not in new_prices:
+                diff.removed.append(name)
+            elif price != new_prices[name]:
+                diff.repriced.append((name, new_prices[name]))
+        for name, price in new_prices.items():
+            if name not in old_prices:
+                diff.added.append(Item(name, price))
+        return diff
+
+    @classmethod
+    def from_str(cls, text):
+        """Parse a diff from its text format."""
+        diff = cls()
+        for line_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                diff._parse_line(line)
+            except (ValueError, InvalidItemNameError,
+                    InvalidItemPriceError) as error:
+                raise ValueError(
+                    f'Invalid diff line {line_no}: "{line}"') from error
+        return diff
+
+    def _parse_line(self, line):
+        """Parse one non-blank line of the text format into the diff."""
+        kind, body = line[:2], line[2:]
+        if kind not in ('+ ', '- ', '~ '):
+            raise ValueError()
+        if kind == '- ':
+            name = body.strip()
+            if not name:
+                raise InvalidItemNameError(name)
+            self.removed.append(name)
+            return
+        name, price = body.split(': ')
+        name, price = name.strip(), float(price.strip())
+        if kind == '+ ':
+            self.added.append(Item(name, price))
+        else:
+            Item(name, price)
+            self.repriced.append((name, price))
+
+    @classmethod
+    def load(cls, path):
+        """Read a diff from a file."""
+        with open(path, encoding='utf-8') as diff_file:
+            return cls.from_str(diff_file.read())
+
+    def save(self, path):
+        """Write the diff to a file."""
+        with open(path, 'w', encoding='utf-8') as diff_file:
+            diff_file.write(str(self))
+
+    def __str__(self):
+        lines = [f'+ {item.name}: {item.price:.2f}' for item in self.added]
+        lines += [f'- {name}' for name in self.removed]
+        lines += [f'~ {name}: {price:.2f}' for name, price in self.repriced]
+        return ''.join(line + '\n' for line in lines)
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.repriced)
+
+    def __repr__(self):
+        return (f'CatalogDiff(added={self.added}, removed={self.removed}, '
+                f'repriced={self.repriced})')
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, CatalogDiff) and self.added == other.added
+            and self.removed == other.removed
+            and self.repriced == other.repriced)
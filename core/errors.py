@@ -82,3 +82,28 @@ class InvalidShoppingListSizeError(Exception):
 
     def __init__(self):
         super().__init__('Invalid List Size!')
+
+
+class InvalidItemRowError(Exception):
+    """
+    Exception raised when a bulk row is not a (name, price) pair.
+
+    Attributes:
+        row: The invalid row.
+    """
+
+    def __init__(self, row):
+        super().__init__(f'Row ({row!r}) is not a (name, price) pair.')
+
+
+class UnboundShoppingListError(Exception):
+    """
+    Exception raised when a compact shopping list is used before it is
+    bound to its item pool.
+
+    Attributes:
+        None
+    """
+
+    def __init__(self):
+        super().__init__('Shopping list is not bound to an item pool!')
@@ -1,31 +1,73 @@
 """Module Description: This module contains the Item and Item Pool class."""
 
+import heapq
 import math
 import random
+import uuid
+import weakref
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP, localcontext
 try:
     from core.errors import (
-        InvalidItemNameError, InvalidItemPriceError,
-        InvalidItemPoolError, DuplicateItemError, NonExistingItemError)
+        InvalidItemPriceError, InvalidItemPoolError, DuplicateItemError,
+        NonExistingItemError)
+    from core.sampling import AliasTable
+    from core.trigram import TrigramIndex
+    from core.validation import (
+        ValidationReport, check_item, make_error, DUPLICATE_ITEM,
+        POOL_ENTRY_INVALID, ROW_INVALID)
 except ImportError:
     pass
 
 
+_POOLS = weakref.WeakValueDictionary()
+
+
+def register_pool(pool):
+    """Give a pool a new pool_id and make it findable through get_pool."""
+    pool.pool_id = uuid.uuid4().hex
+    _POOLS[pool.pool_id] = pool
+
+
+def get_pool(pool_id):
+    """Get a live ItemPool of this process by its pool_id, or None."""
+    return _POOLS.get(pool_id)
+
+
+PoolChange = namedtuple('PoolChange', 'version added removed repriced')
+PoolChange.__doc__ = """A batch of changes made to an ItemPool.
+
+version is the pool version after the batch; added, removed and repriced
+are tuples of the affected Item instances."""
+
+
 class Item:
     """Represents an item with a name and price."""
 
     def __init__(self, name, price):
         """Initialize the item with a name and price."""
-        if not isinstance(name, str) or name == '':
-            raise InvalidItemNameError(name)
+        code = check_item(name, price)
+        if code:
+            raise make_error(code, name, price)
         self.name = name
-        if not isinstance(price, (float, int)) or not price > 0:
-            raise InvalidItemPriceError(price)
         self.price = round(price, 2)
 
+    @classmethod
+    def _from_checked(cls, name, price):
+        """Build an item from a name and price check_item accepted."""
+        item = cls.__new__(cls)
+        item.name = name
+        item.price = round(price, 2)
+        return item
+
     def get_order(self):
         """Calculate the order of the item's price."""
         return math.floor(round(math.log(self.price, 10), 10))
 
+    def get_price_cents(self):
+        """Get the item's price as a whole number of cents."""
+        return round(self.price * 100)
+
     def get_price_str(self, quantity=None, hide_price=False, order=None):
         """Get a formatted string representation of the item's price."""
         if order is None:
@@ -58,7 +100,100 @@ class Item:
             and self.price == other.price)
 
 
-class ItemPool:
+class DenseSamplingMixin:
+    """Adds index and weighted sampling over a pool's dense item tuple.
+
+    Pools using it provide items, weights, pool_id, the _dense_token,
+    _alias_table and _call_alias attributes and get_dense_items()."""
+
+    def get_dense_token(self):
+        """Get a (pool_id, version) token naming the current dense item
+        tuple, used to rebind pickled compact lists to this pool."""
+        self.get_dense_items()
+        return self._dense_token
+
+    def sample_indices(self, sample_size):
+        """Get a sample of positions into the pool's dense item tuple."""
+        size = len(self.get_dense_items())
+        return random.sample(range(size), min(sample_size, size))
+
+    def set_weights(self, weights):
+        """Set the pool's default popularity weights used for weighted
+        sampling.
+
+        Items missing from weights are given a weight of 1."""
+        self._check_weights(weights)
+        self.weights = dict(weights)
+        self._alias_table = None
+        self._call_alias = None
+
+    def _check_weights(self, weights):
+        """Raise if weights is not a dict of pool item names to
+        non-negative numbers."""
+        if not isinstance(weights, dict):
+            raise ValueError()
+        items = self.items
+        for key, val in weights.items():
+            if key not in items:
+                raise NonExistingItemError(key)
+            if not isinstance(val, (float, int)) or val < 0:
+                raise ValueError()
+
+    def get_alias_table(self, weights=None):
+        """Get the alias table over the dense items, rebuilding it lazily
+        after the pool or its weights have changed.
+
+        weights optionally overrides the pool's default weights for some
+        items without changing them; the table for the most recent
+        override is cached too."""
+        if not weights:
+            if self._alias_table is None:
+                self._alias_table = AliasTable(
+                    self.weights.get(item.name, 1)
+                    for item in self.get_dense_items())
+            return self._alias_table
+        if self._call_alias is None or self._call_alias[0] != weights:
+            self._check_weights(weights)
+            table = AliasTable(
+                weights.get(item.name, self.weights.get(item.name, 1))
+                for item in self.get_dense_items())
+            self._call_alias = (dict(weights), table)
+        return self._call_alias[1]
+
+    def weighted_sample_indices(self, sample_size, weights=None):
+        """Get a weighted sample of dense positions without replacement.
+
+        Each draw is O(1) through the alias table and repeats are rejected.
+        If rejections pile up, the rest of the sample is drawn in a single
+        O(n) pass over the remaining weights instead, by keeping the items
+        with the largest random keys u ** (1 / weight)."""
+        table = self.get_alias_table(weights)
+        sample_size = min(sample_size, table.positive)
+        chosen = {}
+        rejections = 0
+        while len(chosen) < sample_size:
+            idx = table.draw()
+            if idx not in chosen:
+                chosen[idx] = None
+                continue
+            rejections += 1
+            if rejections > len(table):
+                keys = (
+                    (random.random() ** (1 / weight), i)
+                    for i, weight in enumerate(table.weights)
+                    if weight > 0 and i not in chosen)
+                for _, i in heapq.nlargest(sample_size - len(chosen), keys):
+                    chosen[i] = None
+        return list(chosen)
+
+    def weighted_sample_items(self, sample_size, weights=None):
+        """Get a weighted sample of items from the pool."""
+        dense = self.get_dense_items()
+        return [dense[i]
+                for i in self.weighted_sample_indices(sample_size, weights)]
+
+
+class ItemPool(DenseSamplingMixin):
     """Represents a pool of items that can be used in a shopping list."""
 
     def __init__(self, items=None):
@@ -71,6 +206,52 @@ class ItemPool:
             if not isinstance(key, str) or not isinstance(val, Item):
                 raise InvalidItemPoolError()
         self.items = items
+        self.weights = {}
+        self.version = 0
+        register_pool(self)
+        self._subscribers = []
+        self._name_index = None
+        self._dense_items = None
+        self._dense_token = None
+        self._alias_table = None
+        self._call_alias = None
+
+    @staticmethod
+    def validate_entries(items):
+        """Validate a name -> Item dict without raising.
+
+        Returns a ValidationReport over the (name, item) entries."""
+        report = ValidationReport(items)
+        for index, (key, val) in enumerate(items.items()):
+            if not isinstance(key, str) or not isinstance(val, Item):
+                report.add(index, POOL_ENTRY_INVALID)
+        return report
+
+    def add_rows(self, rows):
+        """Add many (name, price) rows in one batch without raising.
+
+        Invalid and duplicate rows are skipped and reported in the returned
+        ValidationReport; the valid ones are added."""
+        report = ValidationReport(rows)
+        added = []
+        for index, row in enumerate(rows):
+            try:
+                name, price = row
+            except (TypeError, ValueError):
+                report.add(index, ROW_INVALID)
+                continue
+            code = check_item(name, price)
+            if not code and name in self.items:
+                code = DUPLICATE_ITEM
+            if code:
+                report.add(index, code)
+                continue
+            item = Item._from_checked(name, price)
+            self.items[name] = item
+            added.append(item)
+        if added:
+            self._notify(added=tuple(added))
+        return report
 
     def add_item(self, item):
         """Add an item to the pool."""
@@ -79,12 +260,158 @@ class ItemPool:
         if item.name in self.items:
             raise DuplicateItemError()
         self.items[item.name] = item
+        self._notify(added=(item,))
 
     def remove_item(self, item_name):
         """Remove an item from the pool."""
         if item_name not in self.items:
             raise NonExistingItemError(item_name)
-        del self.items[item_name]
+        item = self.items.pop(item_name)
+        self.weights.pop(item_name, None)
+        self._notify(removed=(item,))
+
+    def subscribe(self, callback):
+        """Register a callback that is called with a PoolChange after every
+        batch of changes to the pool."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a previously registered callback."""
+        self._subscribers.remove(callback)
+
+    def _notify(self, added=(), removed=(), repriced=()):
+        """Bump the version, drop derived caches and notify subscribers.
+
+        Every subscriber is called even if an earlier one raises; the
+        first error is raised once all of them have run."""
+        self.version += 1
+        if added or removed:
+            self._dense_items = None
+            self._alias_table = None
+            self._call_alias = None
+        change = PoolChange(self.version, added, removed, repriced)
+        first_error = None
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception as error:
+                if first_error is None:
+                    first_error = error
+        if first_error is not None:
+            raise first_error
+
+    def get_name_index(self):
+        """Get the trigram index over item names, building it on first use.
+
+        The index then follows the pool through its change notifications."""
+        if self._name_index is None:
+            self._name_index = TrigramIndex(self.items)
+            self.subscribe(self._name_index.on_pool_change)
+        return self._name_index
+
+    def find_items(self, query, limit=5):
+        """Get up to limit items whose names are closest to the query."""
+        return [self.items[name]
+                for name in self.get_name_index().search(query, limit)]
+
+    def reprice(self, func_or_factor, where=None):
+        """Reprice every item matching where in one validated batch.
+
+        func_or_factor is either a positive number the prices are multiplied
+        by, or a function mapping an old price to a new one. where is an
+        optional predicate on items. Factors are applied in decimal and
+        rounded half up to whole cents. If any new price is invalid, no
+        item is changed. Returns the items whose price changed."""
+        matching = [item for item in self.items.values()
+                    if where is None or where(item)]
+        if callable(func_or_factor):
+            new_prices = [func_or_factor(item.price) for item in matching]
+            new_prices = [
+                round(price, 2) if isinstance(price, (float, int)) else price
+                for price in new_prices]
+        else:
+            try:
+                valid = (isinstance(func_or_factor, (float, int))
+                         and math.isfinite(func_or_factor)
+                         and func_or_factor > 0)
+            except OverflowError:
+                valid = False
+            if not valid:
+                raise InvalidItemPriceError(func_or_factor)
+            factor = Decimal(str(func_or_factor))
+            with localcontext() as ctx:
+                # Enough digits for any float price times any float factor
+                # down to cents, so the products are exact and quantize
+                # never fails; too large results become inf and are
+                # rejected below.
+                ctx.prec = 700
+                new_prices = [
+                    float((Decimal(str(item.price)) * factor).quantize(
+                        Decimal('0.01'), ROUND_HALF_UP))
+                    for item in matching]
+        for item, price in zip(matching, new_prices):
+            code = check_item(item.name, price)
+            if code:
+                raise make_error(code, item.name, price)
+        changed = []
+        for item, price in zip(matching, new_prices):
+            if price != item.price:
+                item.price = price
+                changed.append(item)
+        if changed:
+            self._notify(repriced=tuple(changed))
+        return changed
+
+    def snapshot(self):
+        """Get a name -> price snapshot of the pool, usable as either side
+        of CatalogDiff.between."""
+        return {name: item.price for name, item in self.items.items()}
+
+    def apply_diff(self, diff, shopping_lists=None):
+        """Apply a CatalogDiff to the pool as one validated batch.
+
+        The whole diff is checked before anything changes, so an invalid
+        diff leaves the pool untouched. Returns the shopping lists (out of
+        shopping_lists) that reference any removed item."""
+        removed = set(diff.removed)
+        for item_name in removed:
+            if item_name not in self.items:
+                raise NonExistingItemError(item_name)
+        added = set()
+        for item in diff.added:
+            if not isinstance(item, Item):
+                raise InvalidItemPoolError()
+            if item.name in added or (
+                    item.name in self.items and item.name not in removed):
+                raise DuplicateItemError()
+            added.add(item.name)
+        for item_name, price in diff.repriced:
+            if item_name not in self.items or item_name in removed:
+                raise NonExistingItemError(item_name)
+            if check_item(item_name, price):
+                raise InvalidItemPriceError(price)
+
+        removed_items = tuple(self.items.pop(name) for name in removed)
+        for item_name in removed:
+            self.weights.pop(item_name, None)
+        for item in diff.added:
+            self.items[item.name] = item
+        for item_name, price in diff.repriced:
+            self.items[item_name].price = round(price, 2)
+        if len(diff):
+            self._notify(
+                added=tuple(diff.added), removed=removed_items,
+                repriced=tuple(
+                    self.items[name] for name, _ in diff.repriced))
+
+        return [
+            shopping_list for shopping_list in (shopping_lists or [])
+            if any(item.name in removed for item, _ in shopping_list)
+        ]
+
+    def get_item(self, item_name):
+        """Get the item with the given name, or None."""
+        return self.items.get(item_name)
 
     def get_size(self):
         """Get the size of the item pool."""
@@ -96,6 +423,42 @@ class ItemPool:
             random.sample(list(self.items.values()),
                           min(sample_size, len(self.items))))
 
+    def get_dense_items(self):
+        """Get a tuple of all items in the pool, indexable by position.
+
+        The tuple is cached and shared until the pool is mutated, so many
+        index-based shopping lists can reference the same one."""
+        if (self._dense_items is None
+                or len(self._dense_items) != len(self.items)):
+            self._dense_items = tuple(self.items.values())
+            self._dense_token = (self.pool_id, self.version)
+        return self._dense_items
+
+    def __getstate__(self):
+        """Pickle the items, weights, version and pool_id, leaving out
+        subscribers and derived caches.
+
+        The dense token is kept while the dense tuple is current, so
+        compact lists pickled after the pool are rebound to the copy."""
+        state = dict(self.__dict__)
+        if (self._dense_items is None
+                or len(self._dense_items) != len(self.items)):
+            state['_dense_token'] = None
+        state['_dense_items'] = None
+        state['_subscribers'] = []
+        state['_name_index'] = None
+        state['_alias_table'] = None
+        state['_call_alias'] = None
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled pool and register it under its pool_id,
+        unless a pool with that id is already live in this process."""
+        self.__dict__.update(state)
+        if self._dense_token is not None:
+            self._dense_items = tuple(self.items.values())
+        _POOLS.setdefault(self.pool_id, self)
+
     def __repr__(self):
         return f'ItemPool({self.items})'
 
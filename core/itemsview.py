@@ -0,0 +1,37 @@
+"""Module Description: This module contains the ItemsView class."""
+
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+class ItemsView:
+    """Keeps the sorted item names and name column width of an item pool
+    up to date by subscribing to its changes."""
+
+    def __init__(self, item_pool):
+        """Build the view from the pool and subscribe to its changes."""
+        self.item_pool = item_pool
+        self.names = sorted(item_pool.items)
+        self.name_len_counts = Counter(len(name) for name in self.names)
+        self.version = item_pool.version
+        item_pool.subscribe(self.on_pool_change)
+
+    def on_pool_change(self, change):
+        """Update the names and widths from a PoolChange."""
+        for item in change.removed:
+            del self.names[bisect_left(self.names, item.name)]
+            self.name_len_counts[len(item.name)] -= 1
+            if not self.name_len_counts[len(item.name)]:
+                del self.name_len_counts[len(item.name)]
+        for item in change.added:
+            insort(self.names, item.name)
+            self.name_len_counts[len(item.name)] += 1
+        self.version = change.version
+
+    def get_max_name(self):
+        """Get the length of the longest item name."""
+        return max(self.name_len_counts, default=0)
+
+    def close(self):
+        """Stop following the pool."""
+        self.item_pool.unsubscribe(self.on_pool_change)
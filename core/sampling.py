@@ -0,0 +1,52 @@
+"""Module Description: This module contains the AliasTable class."""
+
+import random
+
+
+class AliasTable:
+    """Represents a Walker/Vose alias table for O(1) weighted draws."""
+
+    def __init__(self, weights):
+        """Build the alias table from a sequence of non-negative weights."""
+        weights = list(weights)
+        if not weights:
+            raise ValueError()
+        for weight in weights:
+            if not isinstance(weight, (float, int)) or weight < 0:
+                raise ValueError()
+        total = sum(weights)
+        if not total > 0:
+            raise ValueError()
+        size = len(weights)
+        self.weights = weights
+        self.positive = sum(1 for weight in weights if weight > 0)
+        self.prob = [0.0] * size
+        self.alias = [0] * size
+        scaled = [weight * size / total for weight in weights]
+        small = [i for i, val in enumerate(scaled) if val < 1.0]
+        large = [i for i, val in enumerate(scaled) if val >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def draw(self):
+        """Draw a single index in O(1)."""
+        i = random.randrange(len(self.prob))
+        if random.random() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+    def draw_many(self, k):
+        """Draw k indices with replacement."""
+        return [self.draw() for _ in range(k)]
+
+    def __len__(self):
+        return len(self.prob)
@@ -0,0 +1,266 @@
+"""Module Description: This module contains the ShardedItemPool class."""
+
+import heapq
+import random
+import zlib
+from bisect import bisect_right
+from itertools import accumulate
+import multiprocessing
+try:
+    from core.errors import (
+        InvalidItemPoolError, DuplicateItemError, NonExistingItemError)
+    from core.items import (
+        Item, ItemPool, DenseSamplingMixin, register_pool)
+except ImportError:
+    pass
+
+
+def _run_shard(conn):
+    """Serve ItemPool requests for one shard until told to close."""
+    pool = ItemPool()
+    while True:
+        cmd, arg = conn.recv()
+        if cmd == 'close':
+            conn.close()
+            break
+        try:
+            result = None
+            if cmd == 'add':
+                pool.add_item(arg)
+            elif cmd == 'remove':
+                pool.remove_item(arg)
+            elif cmd == 'size':
+                result = pool.get_size()
+            elif cmd == 'sample':
+                result = pool.sample_items(arg)
+            elif cmd == 'items':
+                result = pool.items
+            elif cmd == 'get':
+                result = pool.get_item(arg)
+            elif cmd == 'find':
+                query, limit = arg
+                result = [
+                    (score, pool.items[name]) for score, name in
+                    pool.get_name_index().search(
+                        query, limit, with_scores=True)]
+            elif cmd == 'reprice':
+                for name, price in arg:
+                    pool.items[name].price = price
+            conn.send((True, result))
+        except (InvalidItemPoolError, DuplicateItemError,
+                NonExistingItemError) as error:
+            conn.send((False, type(error)))
+        except Exception as error:
+            try:
+                conn.send((False, error))
+            except Exception:
+                conn.send((False, RuntimeError(repr(error))))
+
+
+class ShardedItemPool(DenseSamplingMixin):
+    """Represents an item pool hash-partitioned by item name across worker
+    processes, each owning a plain ItemPool behind a pipe.
+
+    It offers the same add_item/remove_item/get_item/get_size/
+    sample_items/find_items/reprice/items interface as ItemPool, so
+    AppEngine and ShoppingList.refresh can use it unchanged. Weighted
+    sampling and compact lists use a dense item tuple gathered from the
+    shards once and cached until the pool changes. Call close() (or use it
+    as a context manager) to stop the workers."""
+
+    def __init__(self, num_shards=2, items=None):
+        """Start the shard workers and add the initial items."""
+        if not isinstance(num_shards, int) or num_shards < 1:
+            raise ValueError()
+        if not items:
+            items = {}
+        if not isinstance(items, dict):
+            raise InvalidItemPoolError()
+        for key, val in items.items():
+            if not isinstance(key, str) or not isinstance(val, Item):
+                raise InvalidItemPoolError()
+        self.conns = []
+        self.processes = []
+        self.weights = {}
+        self.version = 0
+        register_pool(self)
+        self._dense_items = None
+        self._dense_token = None
+        self._alias_table = None
+        self._call_alias = None
+        try:
+            for _ in range(num_shards):
+                conn, worker_conn = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=_run_shard, args=(worker_conn,), daemon=True)
+                process.start()
+                worker_conn.close()
+                self.conns.append(conn)
+                self.processes.append(process)
+            for item in items.values():
+                self.add_item(item)
+        except BaseException:
+            self.close()
+            raise
+
+    def get_shard(self, item_name):
+        """Get the index of the shard owning an item name."""
+        return zlib.crc32(item_name.encode('utf-8')) % len(self.conns)
+
+    def _request(self, shard, cmd, arg=None, error_args=()):
+        """Send a request to one shard and return its result, re-raising
+        the shard's error with error_args."""
+        self.conns[shard].send((cmd, arg))
+        return self._unpack(self.conns[shard].recv(), error_args)
+
+    @staticmethod
+    def _unpack(reply, error_args=()):
+        """Get the result of a shard reply, raising the shard's error.
+
+        Pool errors come back as types and are rebuilt with error_args;
+        any other error comes back as the exception itself."""
+        success, result = reply
+        if success:
+            return result
+        if isinstance(result, BaseException):
+            raise result
+        raise result(*error_args)
+
+    def _broadcast(self, cmd, args):
+        """Send one request per shard and gather the results in order.
+
+        Every reply is received before any error is raised, so no shard
+        is left with an unread reply."""
+        for conn, arg in zip(self.conns, args):
+            conn.send((cmd, arg))
+        replies = [conn.recv() for conn in self.conns]
+        return [self._unpack(reply) for reply in replies]
+
+    def _changed(self):
+        """Bump the version and drop the coordinator's dense caches."""
+        self.version += 1
+        self._dense_items = None
+        self._alias_table = None
+        self._call_alias = None
+
+    def add_item(self, item):
+        """Add an item to the shard owning its name."""
+        if not isinstance(item, Item):
+            raise InvalidItemPoolError()
+        self._request(self.get_shard(item.name), 'add', item)
+        self._changed()
+
+    def remove_item(self, item_name):
+        """Remove an item from the shard owning its name."""
+        if not isinstance(item_name, str):
+            raise NonExistingItemError(item_name)
+        self._request(self.get_shard(item_name), 'remove', item_name,
+                      error_args=(item_name,))
+        self.weights.pop(item_name, None)
+        self._changed()
+
+    def get_item(self, item_name):
+        """Get the item with the given name from its shard, or None."""
+        if not isinstance(item_name, str):
+            return None
+        return self._request(self.get_shard(item_name), 'get', item_name)
+
+    def __contains__(self, item_name):
+        return self.get_item(item_name) is not None
+
+    def find_items(self, query, limit=5):
+        """Get up to limit items whose names are closest to the query,
+        merging every shard's best matches by score."""
+        found = [
+            match for shard_found in self._broadcast(
+                'find', [(query, limit)] * len(self.conns))
+            for match in shard_found]
+        best = heapq.nsmallest(
+            limit, found, key=lambda match: (-match[0], match[1].name))
+        return [item for _, item in best]
+
+    def reprice(self, func_or_factor, where=None):
+        """Reprice every item matching where in one validated batch.
+
+        New prices are computed and validated on the coordinator exactly
+        as ItemPool.reprice does, then sent to the owning shards. Returns
+        copies of the items whose price changed."""
+        changed = ItemPool(self.items).reprice(func_or_factor, where)
+        by_shard = [[] for _ in self.conns]
+        for item in changed:
+            by_shard[self.get_shard(item.name)].append(
+                (item.name, item.price))
+        self._broadcast('reprice', by_shard)
+        if changed:
+            self._changed()
+        return changed
+
+    def get_dense_items(self):
+        """Get a tuple of all items, gathered from the shards and cached
+        until the pool changes. The items are copies."""
+        if self._dense_items is None:
+            self._dense_items = tuple(self.items.values())
+            self._dense_token = (self.pool_id, self.version)
+        return self._dense_items
+
+    def get_shard_sizes(self):
+        """Get the size of every shard."""
+        return self._broadcast('size', [None] * len(self.conns))
+
+    def get_size(self):
+        """Get the size of the item pool."""
+        return sum(self.get_shard_sizes())
+
+    def sample_items(self, sample_size):
+        """Get a uniform sample of items from the pool.
+
+        Positions are drawn over the concatenated shards, so each shard
+        draws exactly its proportional (hypergeometric) share."""
+        sizes = self.get_shard_sizes()
+        total = sum(sizes)
+        bounds = list(accumulate(sizes))
+        counts = [0] * len(sizes)
+        for pos in random.sample(range(total), min(sample_size, total)):
+            counts[bisect_right(bounds, pos)] += 1
+        sample = [item for shard_sample in self._broadcast('sample', counts)
+                  for item in shard_sample]
+        random.shuffle(sample)
+        return sample
+
+    @property
+    def items(self):
+        """Get a name -> Item dict gathered from all shards.
+
+        The items are copies; change the pool through add_item and
+        remove_item."""
+        items = {}
+        for shard_items in self._broadcast('items', [None] * len(self.conns)):
+            items.update(shard_items)
+        return items
+
+    def close(self):
+        """Stop the shard workers, terminating any that do not exit."""
+        for conn, process in zip(self.conns, self.processes):
+            try:
+                conn.send(('close', None))
+            except OSError:
+                pass
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.conns, self.processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'ShardedItemPool({self.items})'
+
+    def __eq__(self, other):
+        return (isinstance(other, (ItemPool, ShardedItemPool))
+                and self.items == other.items)
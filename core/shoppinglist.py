@@ -1,29 +1,121 @@
 """Module Description: This module contains the ShoppingList class."""
 
 import random
+from array import array
+from functools import lru_cache
 try:
-    from core.errors import InvalidShoppingListSizeError
+    from core.errors import (
+        InvalidShoppingListSizeError, UnboundShoppingListError)
+    from core.sampling import AliasTable
+    from core.items import get_pool
 except ImportError:
     pass
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@lru_cache(maxsize=32)
+def _quantity_table(quantity_weights):
+    """Get a cached alias table over quantities 1..len(quantity_weights)."""
+    return AliasTable(quantity_weights)
+
+
+def _merge_line(merged, item, quantity):
+    """Add a quantity of an item to the lines of a merged list."""
+    line = merged.get(item.name)
+    if line is None:
+        merged[item.name] = [item, quantity]
+    elif line[0].price != item.price:
+        raise ValueError()
+    else:
+        line[1] += quantity
+
+
+_BATCH_LINES = 1 << 20
+_BATCH_LISTS = 1 << 14
+
+
+class _PositionCounts:
+    """Per-position quantity totals over one dense item tuple.
+
+    With numpy, lists are buffered and counted with a single bincount per
+    batch of up to _BATCH_LINES lines or _BATCH_LISTS lists, so the
+    pool-sized count array is touched once per batch instead of once per
+    list."""
+
+    def __init__(self, size):
+        """Initialize zeroed counts for a dense tuple of the given size."""
+        if np is not None:
+            self.counts = np.zeros(size, dtype=np.int64)
+        else:
+            self.counts = array('Q', bytes(8 * size))
+        self.pending = []
+        self.pending_lines = 0
+
+    def add(self, indices, quantities):
+        """Add the positions and quantities of a compact list."""
+        if np is None:
+            counts = self.counts
+            for idx, qnt in zip(indices, quantities):
+                counts[idx] += qnt
+            return
+        self.pending.append((indices, quantities))
+        self.pending_lines += len(indices)
+        if (self.pending_lines >= _BATCH_LINES
+                or len(self.pending) >= _BATCH_LISTS):
+            self.flush()
+
+    def flush(self):
+        """Count the buffered lists."""
+        if not self.pending:
+            return
+        indices = np.concatenate([
+            np.frombuffer(idx, dtype=np.uint32) for idx, _ in self.pending])
+        quantities = np.concatenate([
+            np.frombuffer(qnt, dtype=np.uint8) for _, qnt in self.pending])
+        self.counts += np.bincount(
+            indices, weights=quantities,
+            minlength=len(self.counts)).astype(np.int64)
+        self.pending = []
+        self.pending_lines = 0
 
 
 class ShoppingList:
     """Class Description: This class represents a shopping list."""
 
+    __slots__ = ('list', 'stale')
+
     def __init__(self, size=None, quantities=None, item_pool=None):
         """Method Description: Initialize the ShoppingList object."""
         self.list = []
+        self.stale = False
         if item_pool is not None:
             self.refresh(item_pool, size, quantities)
 
-    def refresh(self, item_pool, size=None, quantities=None):
-        """Method Description: Refresh the shopping list with new items."""
+    def refresh(self, item_pool, size=None, quantities=None,
+                weights=None, quantity_weights=None):
+        """Method Description: Refresh the shopping list with new items.
+
+        weights maps item names to popularity weights for this refresh only;
+        items it leaves out keep the pool's default weights (see
+        ItemPool.set_weights), so weights={} samples by those defaults.
+        The pool caches the alias table of the last weights used.
+        quantity_weights gives the weights of quantities 1, 2, 3, ... and is
+        only used when quantities is None."""
+        max_size = item_pool.get_size()
+        if weights is not None:
+            max_size = item_pool.get_alias_table(weights).positive
         if size is None:
-            size = random.randint(1, item_pool.get_size())
+            size = random.randint(1, max_size)
         if not isinstance(size, int) or size < 1:
             raise ValueError()
-        if size > item_pool.get_size():
+        if size > max_size:
             raise InvalidShoppingListSizeError()
+        if quantities is None and quantity_weights is not None:
+            table = _quantity_table(tuple(quantity_weights))
+            quantities = [table.draw() + 1 for _ in range(size)]
         if quantities is None:
             quantities = random.choices(range(1, 10), k=size)
         if not isinstance(quantities, list):
@@ -35,19 +127,201 @@ class ShoppingList:
             quantities = quantities + [1] * (size - len(quantities))
         if len(quantities) > size:
             quantities = quantities[:size]
-        items_list = item_pool.sample_items(size)
+        self._fill(item_pool, size, quantities, weights)
+        self.stale = False
+
+    def _fill(self, item_pool, size, quantities, weights=None):
+        """Method Description: Sample items and store them with quantities."""
+        if weights is not None:
+            items_list = item_pool.weighted_sample_items(size, weights)
+        else:
+            items_list = item_pool.sample_items(size)
         self.list = list(zip(items_list, quantities))
 
+    def on_pool_change(self, change):
+        """Method Description: Mark the list as stale when an item pool
+        change removes one of its items."""
+        if change.removed and not self.stale:
+            removed = {item.name for item in change.removed}
+            if any(item.name in removed for item, _ in self):
+                self.stale = True
+
+    @staticmethod
+    def merge(lists, vectorized=False):
+        """Method Description: Merge shopping lists into one list with a
+        single line per item name.
+
+        lists may be any iterable and is consumed in one pass, so memory
+        grows with the number of distinct items, not line items. With
+        vectorized=True, CompactShoppingLists sharing a dense item tuple
+        are grouped by position into one count array (with one numpy
+        bincount per batch of lists when numpy is installed). Items
+        sharing a name must share a price."""
+        merged = {}
+        dense_counts = {}
+        for shopping_list in lists:
+            if vectorized and isinstance(shopping_list, CompactShoppingList):
+                items = shopping_list.get_items()
+                if id(items) not in dense_counts:
+                    dense_counts[id(items)] = (
+                        items, _PositionCounts(len(items)))
+                dense_counts[id(items)][1].add(
+                    shopping_list.indices, shopping_list.quantities)
+                continue
+            for item, qnt in shopping_list:
+                _merge_line(merged, item, qnt)
+        for items, position_counts in dense_counts.values():
+            position_counts.flush()
+            for idx, qnt in enumerate(position_counts.counts):
+                if qnt:
+                    _merge_line(merged, items[idx], int(qnt))
+        merged_list = ShoppingList()
+        merged_list.list = [tuple(line) for line in merged.values()]
+        return merged_list
+
     def get_total_price(self):
         """Method Description:
         Calculate the total price of the shopping list."""
-        return round(sum(item.price * qnt for item, qnt in self.list), 2)
+        return sum(item.get_price_cents() * qnt for item, qnt in self) / 100
 
     def get_item_price(self, i):
         """Method Description:
         Calculate the price of an item at the given index."""
         return round(self.list[i][0].price * self.list[i][1], 2)
 
+    def __iter__(self):
+        """Method Description: Iterate over (item, quantity) pairs."""
+        return iter(self.list)
+
     def __len__(self):
         """Method Description: Get the length of the shopping list."""
         return len(self.list)
+
+
+class CompactShoppingList(ShoppingList):
+    """Class Description: A shopping list that stores positions into the
+    item pool's dense item tuple and quantities in one packed buffer.
+
+    Each line costs 5 bytes: a 4-byte position and a 1-byte quantity, so
+    quantities must fit in a byte (1-255). Lists refreshed from the same
+    pool share its dense item tuple. Pickles hold only the buffer and the
+    pool's dense token, and are rebound to the pool's tuple on load.
+
+    Pool ids are only known to the process that created or unpickled the
+    pool, so a list unpickled elsewhere comes back unbound (items is None
+    and stale is set) unless its pool was unpickled there first, e.g. by
+    pickling the pool once alongside its lists. An unbound list raises
+    UnboundShoppingListError until bind() is called."""
+
+    __slots__ = ('items', 'data', 'pool_token')
+
+    def __init__(self, size=None, quantities=None, item_pool=None):
+        """Method Description: Initialize the CompactShoppingList object."""
+        self.items = ()
+        self.data = b''
+        self.pool_token = None
+        super().__init__(size, quantities, item_pool)
+
+    def _fill(self, item_pool, size, quantities, weights=None):
+        """Method Description: Sample item positions and store them with
+        quantities."""
+        if max(quantities) > 255:
+            raise ValueError()
+        items = item_pool.get_dense_items()
+        pool_token = item_pool.get_dense_token()
+        if weights is not None:
+            indices = item_pool.weighted_sample_indices(size, weights)
+        else:
+            indices = item_pool.sample_indices(size)
+        self._pack(items, indices, quantities, pool_token)
+
+    def _pack(self, items, indices, quantities, pool_token=None):
+        """Method Description: Store positions and quantities in the
+        packed buffer."""
+        self.data = array('I', indices).tobytes() + bytes(quantities)
+        self.items = items
+        self.pool_token = pool_token
+
+    @property
+    def indices(self):
+        """Method Description: Get the item positions as an unsigned int
+        view of the packed buffer."""
+        return memoryview(self.data)[:4 * len(self)].cast('I')
+
+    @property
+    def quantities(self):
+        """Method Description: Get the quantities as a byte view of the
+        packed buffer."""
+        return memoryview(self.data)[4 * len(self):]
+
+    @property
+    def list(self):
+        """Method Description: Get the list of (item, quantity) pairs."""
+        return list(iter(self))
+
+    @list.setter
+    def list(self, pairs):
+        """Method Description: Set the list from (item, quantity) pairs."""
+        pairs = list(pairs)
+        if any(qnt > 255 for _, qnt in pairs):
+            raise ValueError()
+        self._pack(tuple(item for item, _ in pairs), range(len(pairs)),
+                   [qnt for _, qnt in pairs])
+
+    def bind(self, item_pool):
+        """Method Description: Point the list at the pool's dense item
+        tuple, e.g. after unpickling it in a process that did not have the
+        pool yet. The pool (or an unpickled copy of it) must not have had
+        items added or removed since the list was refreshed."""
+        if self.pool_token != item_pool.get_dense_token():
+            raise ValueError()
+        self.items = item_pool.get_dense_items()
+        self.stale = False
+
+    def __reduce__(self):
+        """Method Description: Pickle only the packed buffer and the pool
+        token (or the items themselves for lists not built from a pool)."""
+        if self.pool_token is None:
+            return _rebuild_compact, (self.data, None, self.items)
+        return _rebuild_compact, (self.data, self.pool_token, None)
+
+    def get_items(self):
+        """Method Description: Get the dense item tuple the positions
+        point into, raising if the list is not bound to its pool."""
+        if self.items is None:
+            raise UnboundShoppingListError()
+        return self.items
+
+    def get_item_price(self, i):
+        """Method Description:
+        Calculate the price of an item at the given index."""
+        return round(
+            self.get_items()[self.indices[i]].price * self.quantities[i], 2)
+
+    def __iter__(self):
+        """Method Description: Iterate over (item, quantity) pairs."""
+        return zip(map(self.get_items().__getitem__, self.indices),
+                   self.quantities)
+
+    def __len__(self):
+        """Method Description: Get the length of the shopping list."""
+        return len(self.data) // 5
+
+
+def _rebuild_compact(data, pool_token, items):
+    """Rebuild a pickled CompactShoppingList, rebinding it to its pool's
+    dense item tuple when that pool is known to this process. Otherwise
+    the list is left unbound and stale."""
+    shopping_list = CompactShoppingList()
+    shopping_list.data = data
+    shopping_list.pool_token = pool_token
+    if items is not None:
+        shopping_list.items = items
+        return shopping_list
+    item_pool = get_pool(pool_token[0])
+    if item_pool is None or item_pool.get_dense_token() != pool_token:
+        shopping_list.items = None
+        shopping_list.stale = True
+    else:
+        shopping_list.items = item_pool.get_dense_items()
+    return shopping_list
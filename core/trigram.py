@@ -0,0 +1,78 @@
+"""Module Description: This module contains the TrigramIndex class."""
+
+import heapq
+import math
+from collections import Counter
+
+
+def get_trigrams(text):
+    """Get the set of lowercase trigrams of a padded string."""
+    padded = f'  {text.lower()} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Represents an inverted index from name trigrams to names, used for
+    fuzzy ("did you mean") lookups."""
+
+    def __init__(self, names=()):
+        """Initialize the index with the given names."""
+        self.postings = {}
+        self.sizes = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """Add a name to the index."""
+        grams = get_trigrams(name)
+        self.sizes[name] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name):
+        """Remove a name from the index."""
+        del self.sizes[name]
+        for gram in get_trigrams(name):
+            posting = self.postings[gram]
+            posting.discard(name)
+            if not posting:
+                del self.postings[gram]
+
+    def on_pool_change(self, change):
+        """Update the index from an item pool PoolChange."""
+        for item in change.removed:
+            self.remove(item.name)
+        for item in change.added:
+            self.add(item.name)
+
+    def search(self, query, limit=5, min_score=0.2, with_scores=False):
+        """Get up to limit names ranked by trigram similarity to the query,
+        or (score, name) pairs when with_scores is set.
+
+        A name scoring at least min_score must share some trigram with the
+        query's rarest ones, so only those posting lists are walked; the
+        more common trigrams are only probed for the candidates found."""
+        grams = get_trigrams(query)
+        postings = sorted(
+            (self.postings.get(gram, ()) for gram in grams), key=len)
+        min_shared = max(1, math.ceil(min_score * len(grams)))
+        split = len(postings) - min_shared + 1
+        counts = Counter()
+        for posting in postings[:split]:
+            counts.update(posting)
+        for posting in postings[split:]:
+            for name in counts:
+                if name in posting:
+                    counts[name] += 1
+        scored = []
+        for name, shared in counts.items():
+            score = shared / (len(grams) + self.sizes[name] - shared)
+            if score >= min_score:
+                scored.append((-score, name))
+        best = heapq.nsmallest(limit, scored)
+        if with_scores:
+            return [(-score, name) for score, name in best]
+        return [name for _, name in best]
+
+    def __len__(self):
+        return len(self.sizes)
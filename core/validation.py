@@ -0,0 +1,117 @@
+"""Module Description: This module contains error codes and the
+ValidationReport class for validating many items at once."""
+
+import math
+from array import array
+from itertools import islice
+try:
+    from core.errors import (
+        InvalidItemNameError, InvalidItemPriceError, InvalidItemPoolError,
+        DuplicateItemError, InvalidItemRowError)
+except ImportError:
+    pass
+
+
+OK = 0
+NAME_NOT_STRING = 1
+NAME_EMPTY = 2
+PRICE_INVALID = 3
+POOL_ENTRY_INVALID = 4
+DUPLICATE_ITEM = 5
+ROW_INVALID = 6
+
+
+def check_item(name, price):
+    """Get the error code for an item name and price (OK if valid)."""
+    if not isinstance(name, str):
+        return NAME_NOT_STRING
+    if name == '':
+        return NAME_EMPTY
+    if not isinstance(price, (float, int)):
+        return PRICE_INVALID
+    try:
+        if not math.isfinite(price) or not round(price, 2) > 0:
+            return PRICE_INVALID
+    except OverflowError:
+        return PRICE_INVALID
+    return OK
+
+
+def make_error(code, name=None, price=None, row=None):
+    """Build the exception matching an error code."""
+    if code == ROW_INVALID:
+        return InvalidItemRowError(row)
+    if code in (NAME_NOT_STRING, NAME_EMPTY):
+        return InvalidItemNameError(name)
+    if code == PRICE_INVALID:
+        return InvalidItemPriceError(price)
+    if code == POOL_ENTRY_INVALID:
+        return InvalidItemPoolError()
+    if code == DUPLICATE_ITEM:
+        return DuplicateItemError()
+    raise ValueError()
+
+
+class ValidationReport:
+    """Represents the errors found while validating (name, price) rows.
+
+    Errors are kept as row indices and codes; messages are only formatted
+    when asked for. rows may also be a dict, whose (key, value) entries
+    are then looked up by position only when formatting."""
+
+    def __init__(self, rows):
+        """Initialize an empty report over the validated rows."""
+        self.rows = rows
+        self.indices = array('I')
+        self.codes = array('B')
+
+    def add(self, index, code):
+        """Record an error code for a row."""
+        self.indices.append(index)
+        self.codes.append(code)
+
+    def messages(self):
+        """Generate a formatted message for every error."""
+        for index, code in self:
+            yield f'Row {index}: {self._make_error(index, code)}'
+
+    def _make_error(self, index, code):
+        """Build the exception for an error of a row."""
+        if isinstance(self.rows, dict):
+            row = next(islice(self.rows.items(), index, None))
+        else:
+            row = self.rows[index]
+        if code == ROW_INVALID:
+            return make_error(code, row=row)
+        name, price = row
+        return make_error(code, name, price)
+
+    def raise_first(self):
+        """Raise the exception for the first error, if any."""
+        if self.codes:
+            raise self._make_error(self.indices[0], self.codes[0])
+
+    def is_valid(self):
+        """Check whether no errors were found."""
+        return not self.codes
+
+    def __iter__(self):
+        return zip(self.indices, self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def validate_rows(rows):
+    """Validate a sequence of (name, price) rows without raising."""
+    report = ValidationReport(rows)
+    for index, row in enumerate(rows):
+        try:
+            name, price = row
+        except (TypeError, ValueError):
+            report.add(index, ROW_INVALID)
+            continue
+        code = check_item(name, price)
+        if code:
+            report.add(index, code)
+    return report
@@ -1,13 +1,24 @@
 import math
+import pickle
+import tracemalloc
 
 import pytest
-from core.shoppinglist import ShoppingList
+from core.shoppinglist import ShoppingList, CompactShoppingList
 from app_cli import AppCLI
 from core.appengine import AppEngine
 from core.items import Item, ItemPool
+from core.sampling import AliasTable
+from core.catalogdiff import CatalogDiff
+from core.itemsview import ItemsView
+from core.trigram import TrigramIndex
+from core.shardedpool import ShardedItemPool
+from core.validation import (
+    validate_rows, NAME_EMPTY, PRICE_INVALID, DUPLICATE_ITEM, POOL_ENTRY_INVALID,
+    ROW_INVALID)
 from core.errors import (
     InvalidItemNameError, InvalidItemPriceError, InvalidShoppingListSizeError,
-    InvalidItemPoolError, DuplicateItemError, NonExistingItemError)
+    InvalidItemPoolError, DuplicateItemError, NonExistingItemError,
+    InvalidItemRowError, UnboundShoppingListError)
 
 
 def test_valid_item_init():
@@ -401,3 +412,646 @@ def test_get_total_price(self):
     # Compare the expected total price with the result from the get_total_price method
     assert shopping_list.get_total_price() == expected_total_price
 
+
+def test_itempool_get_dense_items():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2})
+    dense = item_pool.get_dense_items()
+    assert dense == (item1, item2)
+    assert item_pool.get_dense_items() is dense
+    item_pool.remove_item("Item1")
+    assert item_pool.get_dense_items() == (item2,)
+
+def test_compact_shopping_list_refresh():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2})
+    shopping_list = CompactShoppingList(size=2, quantities=[2, 3],
+                                        item_pool=item_pool)
+    assert len(shopping_list) == 2
+    assert shopping_list.items is item_pool.get_dense_items()
+    assert list(shopping_list.quantities) == [2, 3]
+    assert sorted(item.name for item, _ in shopping_list) == ["Item1", "Item2"]
+    expected = round(sum(item.price * qnt for item, qnt in shopping_list), 2)
+    assert shopping_list.get_total_price() == expected
+    item, qnt = shopping_list.list[1]
+    assert shopping_list.get_item_price(1) == round(item.price * qnt, 2)
+
+def test_compact_shopping_list_invalid_quantity():
+    item_pool = ItemPool({"Item1": Item("Item1", 10)})
+    with pytest.raises(ValueError):
+        CompactShoppingList(size=1, quantities=[256], item_pool=item_pool)
+
+def test_compact_shopping_list_pickle():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2})
+    shopping_list = CompactShoppingList(size=2, quantities=[2, 3],
+                                        item_pool=item_pool)
+    restored = pickle.loads(pickle.dumps(shopping_list))
+    assert restored.list == shopping_list.list
+    assert restored.items is item_pool.get_dense_items()
+
+def test_compact_shopping_list_pickle_size():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(10000)}
+    item_pool = ItemPool(items)
+    shopping_list = CompactShoppingList(size=5, quantities=[1] * 5,
+                                        item_pool=item_pool)
+    assert len(pickle.dumps(shopping_list)) < 200
+    item_pool.remove_item("item0")
+    restored = pickle.loads(pickle.dumps(shopping_list))
+    assert restored.stale
+    with pytest.raises(ValueError):
+        restored.bind(item_pool)
+
+def test_compact_shopping_list_unbound():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(3)}
+    item_pool = ItemPool(items)
+    shopping_list = CompactShoppingList(size=2, quantities=[1, 2],
+                                        item_pool=item_pool)
+    item_pool.remove_item("item0")
+    restored = pickle.loads(pickle.dumps(shopping_list))
+    assert restored.stale and restored.items is None
+    with pytest.raises(UnboundShoppingListError):
+        restored.get_total_price()
+    with pytest.raises(UnboundShoppingListError):
+        ShoppingList.merge([restored], vectorized=True)
+    app = AppCLI(restored, item_pool)
+    app.execute_command("show list")
+    assert app.app_engine.message.startswith('Some items are no longer')
+
+def test_compact_shopping_list_pickled_with_pool():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(3)}
+    item_pool = ItemPool(items)
+    shopping_list = CompactShoppingList(size=2, quantities=[1, 2],
+                                        item_pool=item_pool)
+    item_pool.reprice(2)
+    data = pickle.dumps((item_pool, shopping_list))
+    expected = [(item.name, qnt) for item, qnt in shopping_list]
+    del item_pool, items
+    restored_pool, restored = pickle.loads(data)
+    assert restored.items is restored_pool.get_dense_items()
+    assert [(item.name, qnt) for item, qnt in restored] == expected
+    restored_pool.remove_item("item0")
+    assert restored_pool.get_size() == 2
+
+def test_compact_shopping_list_memory():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(1000)}
+    item_pool = ItemPool(items)
+    item_pool.get_dense_items()
+
+    def measure(cls, size):
+        tracemalloc.start()
+        lists = [cls(size=size, quantities=[2] * size, item_pool=item_pool)
+                 for _ in range(500)]
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(lists) == 500
+        return used / 500
+
+    assert measure(CompactShoppingList, 10) * 4 < measure(ShoppingList, 10)
+    assert measure(CompactShoppingList, 50) * 8 < measure(ShoppingList, 50)
+
+def test_show_list_compact():
+    item_pool = ItemPool({"Milk": Item("Milk", 4.25)})
+    shopping_list = CompactShoppingList(size=1, quantities=[2],
+                                        item_pool=item_pool)
+    app = AppCLI(shopping_list, item_pool)
+    out = app.show_list()
+    assert '- Milk (2x)' in out
+    assert '$8.50' in out
+
+def test_alias_table_draw():
+    table = AliasTable([0, 1, 3])
+    draws = table.draw_many(2000)
+    assert 0 not in draws
+    assert draws.count(2) > draws.count(1)
+
+def test_alias_table_invalid_weights():
+    with pytest.raises(ValueError):
+        AliasTable([])
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+    with pytest.raises(ValueError):
+        AliasTable([1, -1])
+
+def test_itempool_weighted_sample_items():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item3 = Item("Item3", 30)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2, "Item3": item3})
+    item_pool.set_weights({"Item1": 0, "Item2": 5})
+    sample = item_pool.weighted_sample_items(3)
+    assert len(sample) == 2
+    assert item1 not in sample
+    item_pool.remove_item("Item3")
+    assert item_pool.weighted_sample_items(2) == [item2]
+
+def test_itempool_weighted_sample_skewed():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(50)}
+    item_pool = ItemPool(items)
+    weights = {f"item{i}": 1e-6 for i in range(1, 49)}
+    weights["item49"] = 0
+    indices = item_pool.weighted_sample_indices(50, weights)
+    assert sorted(indices) == list(range(49))
+
+def test_itempool_set_weights_invalid():
+    item_pool = ItemPool({"Item1": Item("Item1", 10)})
+    with pytest.raises(NonExistingItemError):
+        item_pool.set_weights({"Item2": 1})
+    with pytest.raises(ValueError):
+        item_pool.set_weights({"Item1": -1})
+
+def test_refresh_with_weights():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2})
+    shopping_list = ShoppingList()
+    shopping_list.refresh(item_pool, size=1, weights={"Item1": 0},
+                          quantity_weights=[0, 0, 1])
+    assert shopping_list.list == [(item2, 3)]
+    assert item_pool.weights == {}
+
+def test_refresh_with_pool_default_weights():
+    item1 = Item("Item1", 10)
+    item2 = Item("Item2", 20)
+    item_pool = ItemPool({"Item1": item1, "Item2": item2})
+    item_pool.set_weights({"Item2": 0})
+    shopping_list = CompactShoppingList()
+    shopping_list.refresh(item_pool, size=1, quantities=[2], weights={})
+    assert shopping_list.list == [(item1, 2)]
+    shopping_list.refresh(item_pool, size=1, quantities=[2],
+                          weights={"Item1": 0, "Item2": 1})
+    assert shopping_list.list == [(item2, 2)]
+
+def test_refresh_with_weights_size_too_large():
+    items = {f"i{i}": Item(f"i{i}", i + 1.0) for i in range(5)}
+    item_pool = ItemPool(items)
+    shopping_list = ShoppingList()
+    with pytest.raises(InvalidShoppingListSizeError):
+        shopping_list.refresh(item_pool, size=4,
+                              weights={"i0": 0, "i1": 0, "i2": 0})
+
+def test_catalog_diff_between():
+    old = ItemPool({"bread": Item("bread", 3.25), "milk": Item("milk", 2.50),
+                    "eggs": Item("eggs", 1.75)})
+    new = {"bread": 3.50, "eggs": 1.75, "tea": 4.00}
+    diff = CatalogDiff.between(old, new)
+    assert diff.added == [Item("tea", 4.00)]
+    assert diff.removed == ["milk"]
+    assert diff.repriced == [("bread", 3.50)]
+
+def test_catalog_diff_between_order():
+    old = {"tea": 4.00, "bread": 3.25, "milk": 2.50, "eggs": 1.75}
+    new = {"milk": 2.75, "tea": 4.50, "jam": 2.00, "cake": 5.00}
+    diff = CatalogDiff.between(old, new)
+    assert diff.removed == ["bread", "eggs"]
+    assert diff.repriced == [("tea", 4.50), ("milk", 2.75)]
+    assert [item.name for item in diff.added] == ["jam", "cake"]
+
+def test_catalog_diff_str_roundtrip():
+    diff = CatalogDiff([Item("tea", 4.0)], ["milk"], [("bread", 3.5)])
+    assert str(diff) == '+ tea: 4.00\n- milk\n~ bread: 3.50\n'
+    assert CatalogDiff.from_str(str(diff)) == diff
+    with pytest.raises(ValueError):
+        CatalogDiff.from_str('* tea: 4.00')
+
+def test_catalog_diff_from_str_requires_prefix():
+    for text in ('-milk', '+tea: 1.0', '~bread: 2.0', '+ tea: 0.001',
+                 '+ : 1.0', '- '):
+        with pytest.raises(ValueError):
+            CatalogDiff.from_str(text)
+    with pytest.raises(ValueError) as exc_info:
+        CatalogDiff.from_str('+ tea: 1.00\n-milk')
+    assert str(exc_info.value) == 'Invalid diff line 2: "-milk"'
+
+def test_itempool_apply_diff():
+    bread = Item("bread", 3.25)
+    milk = Item("milk", 2.50)
+    item_pool = ItemPool({"bread": bread, "milk": milk})
+    shopping_list = ShoppingList()
+    shopping_list.list = [(milk, 2)]
+    other_list = ShoppingList()
+    other_list.list = [(bread, 1)]
+    diff = CatalogDiff([Item("tea", 4.0)], ["milk"], [("bread", 3.5)])
+    affected = item_pool.apply_diff(diff, [shopping_list, other_list])
+    assert affected == [shopping_list]
+    assert item_pool.snapshot() == {"bread": 3.5, "tea": 4.0}
+
+def test_itempool_apply_diff_invalid_is_atomic():
+    item_pool = ItemPool({"bread": Item("bread", 3.25)})
+    diff = CatalogDiff([Item("tea", 4.0)], [], [("milk", 3.5)])
+    with pytest.raises(NonExistingItemError):
+        item_pool.apply_diff(diff)
+    with pytest.raises(DuplicateItemError):
+        item_pool.apply_diff(CatalogDiff([Item("bread", 1.0)]))
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.apply_diff(CatalogDiff(repriced=[("bread", 0.001)]))
+    assert item_pool.snapshot() == {"bread": 3.25}
+
+def test_itempool_subscribe():
+    item_pool = ItemPool()
+    changes = []
+    item_pool.subscribe(changes.append)
+    bread = Item("bread", 3.25)
+    item_pool.add_item(bread)
+    item_pool.apply_diff(CatalogDiff([Item("milk", 2.5)], ["bread"]))
+    assert item_pool.version == 2
+    assert changes[0].added == (bread,)
+    assert changes[1].version == 2
+    assert changes[1].removed == (bread,)
+    item_pool.unsubscribe(changes.append)
+    item_pool.remove_item("milk")
+    assert len(changes) == 2
+
+def test_items_view_follows_pool():
+    item_pool = ItemPool({"milk": Item("milk", 2.5)})
+    view = ItemsView(item_pool)
+    item_pool.add_item(Item("bread", 3.25))
+    item_pool.add_item(Item("Beef Steak", 125.18))
+    assert view.names == ["Beef Steak", "bread", "milk"]
+    assert view.get_max_name() == 10
+    item_pool.remove_item("Beef Steak")
+    assert view.names == ["bread", "milk"]
+    assert view.get_max_name() == 5
+    assert view.version == item_pool.version
+    view.close()
+    item_pool.remove_item("milk")
+    assert view.names == ["bread", "milk"]
+
+def test_show_items_after_add():
+    item_pool = ItemPool({"milk": Item("milk", 2.5)})
+    app = AppCLI(ShoppingList(), item_pool)
+    app.show_items()
+    app.app_engine.process_add_item("add bread: 3.25")
+    assert app.show_items() == (
+        'ITEMS\n- bread ... $3.25\n- milk .... $2.50\n')
+
+def test_shopping_list_stale_after_del():
+    milk = Item("milk", 2.5)
+    item_pool = ItemPool({"milk": milk, "bread": Item("bread", 3.25)})
+    shopping_list = ShoppingList()
+    shopping_list.list = [(milk, 1)]
+    app_engine = AppEngine(shopping_list, item_pool)
+    app_engine.process_del_item("del bread")
+    assert not shopping_list.stale
+    app_engine.process_del_item("del milk")
+    assert shopping_list.stale
+    app_engine.close()
+    shopping_list.stale = False
+    item_pool.add_item(milk)
+    item_pool.remove_item("milk")
+    assert not shopping_list.stale
+
+def test_pool_notify_reaches_all_subscribers():
+    item_pool = ItemPool({"milk": Item("milk", 2.5),
+                          "bread": Item("bread", 3.25)})
+    item_pool.get_name_index()
+    seen = []
+
+    def failing(change):
+        raise RuntimeError()
+
+    item_pool.subscribe(failing)
+    item_pool.subscribe(seen.append)
+    with pytest.raises(RuntimeError):
+        item_pool.remove_item("milk")
+    assert len(seen) == 1
+    assert item_pool.find_items("milk") == []
+
+def test_unbound_list_del_item():
+    items = {"milk": Item("milk", 2.5), "bread": Item("bread", 3.25),
+             "beer": Item("beer", 1.5)}
+    item_pool = ItemPool(items)
+    shopping_list = CompactShoppingList(size=2, quantities=[1, 1],
+                                        item_pool=item_pool)
+    item_pool.remove_item("beer")
+    restored = pickle.loads(pickle.dumps(shopping_list))
+    app_engine = AppEngine(restored, item_pool)
+    item_pool.get_name_index()
+    app_engine.process_del_item("del milk")
+    assert item_pool.find_items("milk") == []
+    app_engine.close()
+
+def test_apply_empty_diff():
+    item_pool = ItemPool({"milk": Item("milk", 2.5)})
+    seen = []
+    item_pool.subscribe(seen.append)
+    item_pool.apply_diff(CatalogDiff())
+    assert item_pool.version == 0
+    assert seen == []
+
+def test_trigram_index_search():
+    index = TrigramIndex(["Milk", "Macbook", "Beef Steak", "Milk Chocolate"])
+    assert index.search("milc")[0] == "Milk"
+    assert "Beef Steak" not in index.search("milc")
+    index.remove("Milk")
+    assert "Milk" not in index.search("milk")
+    assert len(index) == 3
+
+def test_itempool_find_items_follows_pool():
+    milk = Item("Milk", 4.25)
+    item_pool = ItemPool({"Milk": milk})
+    assert item_pool.find_items("mlk") == [milk]
+    steak = Item("Beef Steak", 25.18)
+    item_pool.add_item(steak)
+    assert item_pool.find_items("beef stake") == [steak]
+    item_pool.remove_item("Milk")
+    assert item_pool.find_items("milk") == []
+
+def test_process_del_item_suggestion(capsys):
+    item_pool = ItemPool({"Milk": Item("Milk", 4.25)})
+    app_engine = AppEngine(items=item_pool)
+    app_engine.process_del_item("del Mikl")
+    assert 'Did you mean: Milk?' in capsys.readouterr().out
+
+def test_process_find_item():
+    item_pool = ItemPool({"Milk": Item("Milk", 4.25)})
+    app_engine = AppEngine(items=item_pool)
+    assert app_engine.process_find_item("find ~milc") == (
+        'FOUND\n- Milk ... $4.25')
+    assert app_engine.process_find_item("find Milk") == (
+        'FOUND\n- Milk ... $4.25')
+    assert app_engine.process_find_item("find Tea") == (
+        'No items match "Tea".\nUsage: find <item_name>|~<query>')
+
+def test_validate_rows():
+    rows = [("bread", 3.25), ("", 1.0), ("milk", -2), ("eggs", 1.75)]
+    report = validate_rows(rows)
+    assert not report.is_valid()
+    assert list(report) == [(1, NAME_EMPTY), (2, PRICE_INVALID)]
+    assert list(report.messages())[0] == (
+        'Row 1: Item name string cannot be empty.')
+    with pytest.raises(InvalidItemNameError):
+        report.raise_first()
+
+def test_validate_rows_malformed():
+    rows = [("bread", 3.25), ("milk",), None, ("eggs", 1.75, 2)]
+    report = validate_rows(rows)
+    assert list(report) == [(1, ROW_INVALID), (2, ROW_INVALID),
+                            (3, ROW_INVALID)]
+    assert list(report.messages())[1] == (
+        'Row 2: Row (None) is not a (name, price) pair.')
+    with pytest.raises(InvalidItemRowError):
+        report.raise_first()
+
+def test_validate_rows_huge_price():
+    report = validate_rows([("bread", 10 ** 400), ("milk", 2.5)])
+    assert list(report) == [(0, PRICE_INVALID)]
+    with pytest.raises(InvalidItemPriceError):
+        Item("bread", 10 ** 400)
+
+def test_validate_rows_clean():
+    report = validate_rows([("bread", 3.25), ("milk", 2.5)])
+    assert report.is_valid()
+    assert len(report) == 0
+    report.raise_first()
+
+def test_itempool_validate_entries():
+    report = ItemPool.validate_entries(
+        {"bread": Item("bread", 3.25), 2: Item("item2", 20.0)})
+    assert list(report) == [(1, POOL_ENTRY_INVALID)]
+    assert list(report.messages())[0].startswith('Row 1: ItemsPool')
+    with pytest.raises(InvalidItemPoolError):
+        report.raise_first()
+
+def test_itempool_add_rows():
+    item_pool = ItemPool({"bread": Item("bread", 3.25)})
+    changes = []
+    item_pool.subscribe(changes.append)
+    report = item_pool.add_rows(
+        [("milk", 2.5), ("bread", 1.0), ("eggs", "x"), ("milk", 3.0), 7])
+    assert list(report) == [
+        (1, DUPLICATE_ITEM), (2, PRICE_INVALID), (3, DUPLICATE_ITEM),
+        (4, ROW_INVALID)]
+    assert item_pool.snapshot() == {"bread": 3.25, "milk": 2.5}
+    assert len(changes) == 1
+
+def test_item_get_price_cents():
+    assert Item('bread', 3.25).get_price_cents() == 325
+    assert Item('milk', 0.1).get_price_cents() == 10
+
+def test_shopping_list_merge():
+    bread = Item("bread", 3.25)
+    milk = Item("milk", 0.1)
+    list1 = ShoppingList()
+    list1.list = [(bread, 2), (milk, 3)]
+    list2 = ShoppingList()
+    list2.list = [(milk, 4)]
+    merged = ShoppingList.merge(iter([list1, list2]))
+    assert merged.list == [(bread, 2), (milk, 7)]
+    assert merged.get_total_price() == 7.2
+
+def test_shopping_list_merge_vectorized():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 0.1)})
+    lists = [CompactShoppingList(size=2, quantities=[2, 3],
+                                 item_pool=item_pool) for _ in range(5)]
+    plain = ShoppingList()
+    plain.list = [(item_pool.items["milk"], 1)]
+    merged = ShoppingList.merge(lists + [plain], vectorized=True)
+    quantities = {item.name: qnt for item, qnt in merged}
+    assert sum(quantities.values()) == 26
+    assert quantities == {
+        item.name: qnt for item, qnt in ShoppingList.merge(lists + [plain])}
+    assert len(merged) == 2
+
+def test_shopping_list_merge_vectorized_numpy(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    import core.shoppinglist
+    monkeypatch.setattr(core.shoppinglist, "np", numpy)
+    monkeypatch.setattr(core.shoppinglist, "_BATCH_LINES", 7)
+    items = {f"item{i}": Item(f"item{i}", i + 0.25) for i in range(20)}
+    item_pool = ItemPool(items)
+    lists = [CompactShoppingList(size=5, item_pool=item_pool)
+             for _ in range(30)]
+    merged = ShoppingList.merge(lists, vectorized=True)
+    expected = ShoppingList.merge(lists)
+    assert ({item.name: qnt for item, qnt in merged}
+            == {item.name: qnt for item, qnt in expected})
+    assert merged.get_total_price() == expected.get_total_price()
+
+def test_position_counts_list_cap(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    import core.shoppinglist
+    monkeypatch.setattr(core.shoppinglist, "np", numpy)
+    monkeypatch.setattr(core.shoppinglist, "_BATCH_LISTS", 2)
+    shopping_list = CompactShoppingList()
+    shopping_list.list = [(Item("milk", 2.5), 3)]
+    counts = core.shoppinglist._PositionCounts(1)
+    for _ in range(3):
+        counts.add(shopping_list.indices, shopping_list.quantities)
+    assert len(counts.pending) == 1
+    counts.flush()
+    assert list(counts.counts) == [9]
+
+def test_shopping_list_merge_price_conflict():
+    list1 = ShoppingList()
+    list1.list = [(Item("bread", 3.25), 1)]
+    list2 = ShoppingList()
+    list2.list = [(Item("bread", 3.50), 1)]
+    with pytest.raises(ValueError):
+        ShoppingList.merge([list1, list2])
+
+def test_itempool_reprice_factor():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 1.05)})
+    changes = []
+    item_pool.subscribe(changes.append)
+    changed = item_pool.reprice(1.1)
+    assert item_pool.snapshot() == {"bread": 3.58, "milk": 1.16}
+    assert len(changed) == 2
+    assert changes[0].repriced == tuple(changed)
+
+def test_itempool_reprice_func_where():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 1.05)})
+    item_pool.reprice(lambda price: price - 1,
+                      where=lambda item: item.name == "bread")
+    assert item_pool.snapshot() == {"bread": 2.25, "milk": 1.05}
+
+def test_itempool_reprice_invalid_is_atomic():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 1.05)})
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(lambda price: price - 2)
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(-1)
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(lambda price: 0.004)
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(float("inf"))
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(lambda price: float("nan"))
+    assert item_pool.snapshot() == {"bread": 3.25, "milk": 1.05}
+    item_pool.reprice(0.004, where=lambda item: item.name == "bread")
+    assert item_pool.snapshot() == {"bread": 0.01, "milk": 1.05}
+
+def test_itempool_reprice_huge_factor():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 1e300)})
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(1e30)
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(10 ** 400)
+    with pytest.raises(InvalidItemPriceError):
+        item_pool.reprice(lambda price: 10 ** 400)
+    item_pool.reprice(1e30, where=lambda item: item.name == "bread")
+    assert item_pool.get_item("bread").price == 3.25e30
+
+def test_process_reprice():
+    item_pool = ItemPool({"bread": Item("bread", 3.25),
+                          "milk": Item("milk", 1.05)})
+    app = AppCLI(ShoppingList(), item_pool)
+    app.show_items()
+    app.execute_command("reprice 2 milk")
+    assert app.app_engine.message == '1 items repriced.'
+    assert item_pool.snapshot() == {"bread": 3.25, "milk": 2.1}
+    app.execute_command("reprice 10 bread")
+    assert app.show_items() == (
+        'ITEMS\n- bread ... $32.50\n- milk .... $2.10\n')
+    assert app.app_engine.process_reprice("reprice x") == (
+        'could not convert string to float: "x"')
+    app.execute_command("reprice inf")
+    assert app.app_engine.message.startswith('The price argument ("inf")')
+    app.execute_command("reprice 1e400")
+    assert app.app_engine.message.startswith('The price argument ("inf")')
+    assert item_pool.snapshot() == {"bread": 32.5, "milk": 2.1}
+    assert app.app_engine.process_reprice("reprice 2 tea") == (
+        'Item named "tea"is not present in the item pool.')
+
+def test_sharded_itempool_add_remove():
+    with ShardedItemPool(num_shards=3) as item_pool:
+        bread = Item("bread", 3.25)
+        item_pool.add_item(bread)
+        item_pool.add_item(Item("milk", 2.50))
+        item_pool.add_item(Item("eggs", 1.75))
+        assert item_pool.get_size() == 3
+        assert item_pool.items["bread"] == bread
+        with pytest.raises(DuplicateItemError):
+            item_pool.add_item(Item("bread", 1.0))
+        with pytest.raises(InvalidItemPoolError):
+            item_pool.add_item("bread")
+        item_pool.remove_item("bread")
+        with pytest.raises(NonExistingItemError):
+            item_pool.remove_item("bread")
+        assert sorted(item_pool.items) == ["eggs", "milk"]
+
+def test_sharded_itempool_sample_items():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(20)}
+    with ShardedItemPool(num_shards=2, items=items) as item_pool:
+        assert item_pool.get_size() == sum(item_pool.get_shard_sizes())
+        sample = item_pool.sample_items(5)
+        assert len(sample) == 5
+        assert len({item.name for item in sample}) == 5
+        assert len(item_pool.sample_items(50)) == 20
+
+def test_sharded_itempool_with_app():
+    with ShardedItemPool(num_shards=2) as item_pool:
+        app_engine = AppEngine(ShoppingList(), item_pool)
+        app_engine.process_add_item("add bread: 3.25")
+        app_engine.process_add_item("add milk: 2.50")
+        app_engine.process_del_item("del bread")
+        app_engine.shopping_list.refresh(item_pool, size=1, quantities=[2])
+        assert app_engine.shopping_list.list == [(Item("milk", 2.5), 2)]
+        app = AppCLI(app_engine.shopping_list, item_pool)
+        assert app.show_items() == 'ITEMS\n- milk ... $2.50\n'
+
+def test_sharded_itempool_cli_commands(capsys):
+    with ShardedItemPool(num_shards=2) as item_pool:
+        app = AppCLI(ShoppingList(), item_pool)
+        app.execute_command("add Milk: 4.25")
+        app.execute_command("add Beef Steak: 25.18")
+        app.execute_command("find ~mlk")
+        assert app.app_engine.message == 'FOUND\n- Milk ... $4.25'
+        app.execute_command("find Beef Steak")
+        assert app.app_engine.message == 'FOUND\n- Beef Steak ... $25.18'
+        app.execute_command("reprice 2 Milk")
+        assert app.app_engine.message == '1 items repriced.'
+        assert item_pool.get_item("Milk").price == 8.5
+        app.execute_command("del Mikl")
+        assert 'Did you mean: Milk?' in capsys.readouterr().out
+        app.execute_command("l")
+        app.execute_command("show list")
+        assert app.app_engine.message.startswith('SHOPPING LIST\n')
+        app.execute_command("show items")
+        assert app.app_engine.message == (
+            'ITEMS\n- Beef Steak ... $25.18\n- Milk ......... $8.50\n')
+
+def test_sharded_itempool_compact_and_weighted():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(6)}
+    with ShardedItemPool(num_shards=2, items=items) as item_pool:
+        assert "item3" in item_pool
+        assert "item9" not in item_pool
+        shopping_list = CompactShoppingList(size=3, item_pool=item_pool)
+        assert len(shopping_list) == 3
+        restored = pickle.loads(pickle.dumps(shopping_list))
+        assert restored.list == shopping_list.list
+        weights = {f"item{i}": 0 for i in range(5)}
+        shopping_list.refresh(item_pool, size=1, quantities=[2],
+                              weights=weights)
+        assert shopping_list.list == [(items["item5"], 2)]
+        assert item_pool.weights == {}
+        with pytest.raises(InvalidShoppingListSizeError):
+            shopping_list.refresh(item_pool, size=2, weights=weights)
+
+def test_sharded_itempool_worker_errors():
+    items = {f"item{i}": Item(f"item{i}", i + 1.0) for i in range(4)}
+    with ShardedItemPool(num_shards=2, items=items) as item_pool:
+        with pytest.raises(AttributeError):
+            item_pool.find_items(None)
+        assert item_pool.get_size() == 4
+        assert item_pool.find_items("item1", limit=1) == [items["item1"]]
+        item_pool.processes[0].terminate()
+        item_pool.processes[0].join()
+    assert item_pool.processes == []
+
+def test_sharded_itempool_invalid_items():
+    with pytest.raises(InvalidItemPoolError):
+        ShardedItemPool(items=[Item("milk", 2.5)])
+    with pytest.raises(InvalidItemPoolError):
+        ShardedItemPool(items={"milk": 2.5})
+    with pytest.raises(DuplicateItemError):
+        ShardedItemPool(items={"milk": Item("milk", 2.5),
+                               "Milk": Item("milk", 2.5)})